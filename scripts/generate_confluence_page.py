@@ -35,14 +35,27 @@ Environment variables (for --publish):
 
 import argparse
 import csv
+import gzip
+import hashlib
 import html
+import io
 import json
 import os
+import re
+import socket
+import ssl
 import sys
-from collections import Counter, OrderedDict
+import time
+from collections import defaultdict, namedtuple
+from dataclasses import dataclass, field
+from functools import cache
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from operator import itemgetter
 from pathlib import Path
-from urllib.request import Request, urlopen
+from typing import Iterable, Iterator, TextIO
 from urllib.error import HTTPError
+from urllib.parse import unquote, urlsplit
+from urllib.request import getproxies, proxy_bypass
 import base64
 
 # ─────────────────────────────────────────────────────────────
@@ -90,145 +103,258 @@ TYPE_SHAPES = {
 # Data loading
 # ─────────────────────────────────────────────────────────────
 
-def load_products(csv_path: str) -> list[dict]:
-    """Load products from CSV file."""
-    products = []
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            products.append({
-                "name": row["name"].strip(),
-                "function_group": row["function_group"].strip(),
-                "product_type": row["product_type"].strip(),
-                "family_line": row["family_line"].strip(),
-            })
-    return products
+Product = namedtuple("Product", "name function_group product_type family_line")
+
 
+CSV_COLUMNS = ("name", "function_group", "product_type", "family_line")
 
-def get_products(products, family_line, product_type):
-    """Filter products by family line and product type."""
-    return [p for p in products if p["family_line"] == family_line and p["product_type"] == product_type]
 
+def iter_products(csv_path: str) -> Iterator[Product]:
+    """Lazily yield products from CSV file, one row at a time.
+
+    Columns are located by header name (ignoring surrounding whitespace and a
+    UTF-8 BOM), so extra or reordered columns are fine. Raises ValueError if a
+    required column is missing or a row is too short to hold it.
+    """
+    with open(csv_path, newline="", encoding="utf-8-sig", buffering=1 << 20) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        idx = {h.strip(): i for i, h in enumerate(header)}
+        missing = [c for c in CSV_COLUMNS if c not in idx]
+        if missing:
+            raise ValueError(f"{csv_path}: missing required column(s): {', '.join(missing)}")
+        ni, gi, ti, li = (idx[c] for c in CSV_COLUMNS)
+        min_len = max(ni, gi, ti, li) + 1
+        intern = sys.intern
+        for row in reader:
+            if row:
+                if len(row) < min_len:
+                    raise ValueError(
+                        f"{csv_path}:{reader.line_num}: expected at least {min_len} "
+                        f"fields, got {len(row)}"
+                    )
+                # Categorical fields take a handful of values; interning shares one
+                # string per value and speeds up counter and cell-key lookups
+                yield Product(
+                    row[ni].strip(),
+                    intern(row[gi].strip()),
+                    intern(row[ti].strip()),
+                    intern(row[li].strip()),
+                )
+
+
+@dataclass
+class ProductIndex:
+    """Products bucketed into (family_line, product_type) cells, with per-dimension counts.
+
+    Each cell holds parallel `(names, function_groups)` lists; the family line
+    and product type are implied by the cell key.
+    """
+    cells: defaultdict = field(default_factory=lambda: defaultdict(lambda: ([], [])))
+    fg_counts: dict[str, int] = field(default_factory=dict)
+    type_counts: dict[str, int] = field(default_factory=dict)
+    fl_counts: dict[str, int] = field(default_factory=dict)
+    total: int = 0
 
+
+def index_products(products: Iterable[Product]) -> ProductIndex:
+    """Bucket and count products in a single pass.
+
+    Passing iter_products() fuses this with the CSV parse, so the catalog is
+    never held as a separate list.
+    """
+    index = ProductIndex()
+    cells = index.cells
+    fg_counts, type_counts, fl_counts = index.fg_counts, index.type_counts, index.fl_counts
+    total = 0
+    for p in products:
+        total += 1
+        # Plain dicts stay on the interpreter's exact-dict fast paths;
+        # Counter's += is several times slower in this loop
+        fg_counts[p.function_group] = fg_counts.get(p.function_group, 0) + 1
+        type_counts[p.product_type] = type_counts.get(p.product_type, 0) + 1
+        fl_counts[p.family_line] = fl_counts.get(p.family_line, 0) + 1
+        names, groups = cells[(p.family_line, p.product_type)]
+        names.append(p.name)
+        groups.append(p.function_group)
+    index.total = total
+    return index
+
+
+_SLUG_SEPARATORS = re.compile(r"[ &/]+")
+
+
+@cache
 def slug(s: str) -> str:
     """Convert a string to a CSS class-safe slug."""
-    return s.lower().replace(" & ", "-").replace(" ", "-").replace("/", "-")
+    return _SLUG_SEPARATORS.sub("-", s.lower())
+
+
+# Escaped labels for the fixed function groups, product types and family lines
+_ESC = {s: html.escape(s) for s in FUNCTION_GROUPS + PRODUCT_TYPES + FAMILY_LINES}
+
+# Distribution bar color for each function group
+_FG_DOT = {fg: c["dot"] for fg, c in FUNCTION_COLORS.items()}
+
+
+@cache
+def _fg_badge_parts(fg: str) -> tuple[str, str]:
+    """Opening and middle badge fragments, which depend only on the function group."""
+    return f'<span class="pl-badge fg-{slug(fg)}" title="', f'&#10;{html.escape(fg)} &middot; '
+
+
+_BADGE_DOT = '"><span class="pl-dot"></span>'
+_BADGE_CLOSE = '</span>'
+
+# Product type markup is fixed; only the column counts vary per page
+_SHAPE_KEY = "".join(
+    [
+        '<div class="pl-shapes">\n',
+        '  <span class="pl-eyebrow">Product Types</span>\n',
+        *(
+            f'  <span class="pl-shape-item">'
+            f'<span class="pl-shape-icon">{TYPE_SHAPES[pt][0]}</span> {_ESC[pt]}</span>\n'
+            for pt in PRODUCT_TYPES
+        ),
+        '</div>\n',
+    ]
+)
+_TH_OPEN = {
+    pt: (
+        f'  <th>'
+        f'<span class="pl-col-icon">{TYPE_SHAPES[pt][0]}</span>'
+        f'<span class="pl-col-title">{_ESC[pt]}</span><br/>'
+        f'<span class="pl-col-count">'
+    )
+    for pt in PRODUCT_TYPES
+}
+_TH_CLOSE = ' products</span></th>\n'
+
+# Legend chips and matrix row headings for the canonical labels
+_LEGEND_CHIP = {
+    fg: (
+        f'    <span class="pl-legend-chip">'
+        f'<span class="pl-legend-dot fg-{slug(fg)}"></span>'
+        f'{_ESC[fg]}</span>\n'
+    )
+    for fg in FUNCTION_GROUPS
+}
+_ROW_OPEN = {
+    fl: f'<tr>\n  <td><span class="pl-row-title">{_ESC[fl]}</span><span class="pl-row-count">'
+    for fl in FAMILY_LINES
+}
+_ROW_OPEN_CLOSE = ' products</span></td>\n'
+
+_EMPTY_CELL = '  <td><div class="pl-cell"><span class="pl-empty">&mdash;</span></div></td>\n'
+_CELL_OPEN = '  <td><div class="pl-cell">'
+_CELL_CLOSE = '</div></td>\n'
 
 
 # ─────────────────────────────────────────────────────────────
 # CSS generation (for the Confluence CSS macro)
 # ─────────────────────────────────────────────────────────────
 
+@cache
 def generate_css() -> str:
-    """Generate the CSS stylesheet for the product landscape."""
+    """Generate the CSS stylesheet for the product landscape.
 
-    # Function group badge colors
-    fg_rules = []
-    for fg, c in FUNCTION_COLORS.items():
-        cls = slug(fg)
-        fg_rules.append(
-            f".pl-badge.fg-{cls} {{\n"
-            f"  background: {c['bg']};\n"
-            f"  color: {c['text']};\n"
-            f"  border: 1px solid {c['border']};\n"
-            f"}}\n"
-            f".pl-badge.fg-{cls} .pl-dot {{\n"
-            f"  background: {c['dot']};\n"
-            f"}}\n"
-            f".pl-legend-dot.fg-{cls} {{\n"
-            f"  background: {c['dot']};\n"
-            f"}}"
-        )
+    The stylesheet depends only on module constants, so it is built once
+    and reused by every output mode.
+    """
+    buf = io.StringIO()
+    w = buf.write
 
-    return f"""\
+    w("""\
 /* ═══════════════════════════════════════════════════════════
    Product Landscape – Confluence CSS Macro Stylesheet
    Paste this into a CSS macro on the same Confluence page
    ═══════════════════════════════════════════════════════════ */
 
 /* ── Reset scoped to .pl ─────────────────────────────── */
-.pl * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-.pl {{
+.pl * { margin: 0; padding: 0; box-sizing: border-box; }
+.pl {
   max-width: 1440px;
   margin: 0 auto;
   font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
   color: #1e293b;
   line-height: 1.5;
-}}
+}
 
 /* ── Accent bar ──────────────────────────────────────── */
-.pl-accent {{
+.pl-accent {
   height: 6px;
   background: linear-gradient(to right, #3B82F6, #8B5CF6, #10B981);
   border-radius: 4px 4px 0 0;
-}}
+}
 
 /* ── Header ──────────────────────────────────────────── */
-.pl-header {{
+.pl-header {
   padding: 36px 0 28px 0;
   border-bottom: 1px solid #e2e8f0;
-}}
-.pl-eyebrow {{
+}
+.pl-eyebrow {
   font-size: 11px;
   font-weight: 600;
   letter-spacing: 0.15em;
   color: #94a3b8;
   text-transform: uppercase;
   margin-bottom: 10px;
-}}
-.pl-header h1 {{
+}
+.pl-header h1 {
   font-size: 30px;
   font-weight: 700;
   color: #0f172a;
   letter-spacing: -0.025em;
   margin-bottom: 8px;
-}}
-.pl-subtitle {{
+}
+.pl-subtitle {
   color: #64748b;
   font-size: 14px;
   line-height: 1.6;
   max-width: 640px;
   margin-bottom: 28px;
-}}
+}
 
 /* ── Stats row ───────────────────────────────────────── */
-.pl-stats {{
+.pl-stats {
   display: flex;
   flex-wrap: wrap;
   gap: 14px;
-}}
-.pl-stat {{
+}
+.pl-stat {
   display: flex;
   align-items: center;
   gap: 12px;
   border: 1px solid #e2e8f0;
   border-radius: 8px;
   padding: 10px 22px;
-}}
-.pl-stat-val {{
+}
+.pl-stat-val {
   font-size: 24px;
   font-weight: 700;
   color: #0f172a;
-}}
-.pl-stat-lbl {{
+}
+.pl-stat-lbl {
   font-size: 13px;
   color: #64748b;
-}}
+}
 
 /* ── Legend ───────────────────────────────────────────── */
-.pl-legend {{
+.pl-legend {
   background: #f8fafc;
   padding: 20px 24px;
   border-radius: 8px;
   margin: 16px 0;
-}}
-.pl-legend-items {{
+}
+.pl-legend-items {
   display: flex;
   flex-wrap: wrap;
   gap: 6px 16px;
   margin-top: 10px;
-}}
-.pl-legend-chip {{
+}
+.pl-legend-chip {
   display: inline-flex;
   align-items: center;
   gap: 8px;
@@ -238,60 +364,60 @@ def generate_css() -> str:
   color: #334155;
   background: #fff;
   border: 1px solid #e2e8f0;
-}}
-.pl-legend-dot {{
+}
+.pl-legend-dot {
   width: 11px;
   height: 11px;
   border-radius: 3px;
   flex-shrink: 0;
-}}
+}
 
 /* ── Shape key ───────────────────────────────────────── */
-.pl-shapes {{
+.pl-shapes {
   display: flex;
   align-items: center;
   gap: 12px;
   padding: 12px 0 20px 0;
   flex-wrap: wrap;
-}}
-.pl-shapes .pl-eyebrow {{
+}
+.pl-shapes .pl-eyebrow {
   margin-bottom: 0;
   margin-right: 8px;
-}}
-.pl-shape-item {{
+}
+.pl-shape-item {
   display: inline-flex;
   align-items: center;
   gap: 6px;
   font-size: 13px;
   color: #475569;
   margin-right: 20px;
-}}
-.pl-shape-icon {{
+}
+.pl-shape-icon {
   font-size: 15px;
   color: #334155;
-}}
+}
 
 /* ── Matrix table ────────────────────────────────────── */
-.pl-matrix-wrap {{
+.pl-matrix-wrap {
   overflow-x: auto;
   padding-bottom: 16px;
-}}
-.pl-matrix {{
+}
+.pl-matrix {
   width: 100%;
   border-collapse: collapse;
   border: 1px solid #e2e8f0;
   border-radius: 12px;
   overflow: hidden;
   min-width: 920px;
-}}
-.pl-matrix thead th {{
+}
+.pl-matrix thead th {
   background: #fff;
   padding: 14px 12px;
   border-bottom: 2px solid #e2e8f0;
   vertical-align: bottom;
   text-align: center;
-}}
-.pl-matrix thead th:first-child {{
+}
+.pl-matrix thead th:first-child {
   text-align: left;
   width: 175px;
   font-size: 11px;
@@ -299,63 +425,63 @@ def generate_css() -> str:
   letter-spacing: 0.1em;
   color: #94a3b8;
   text-transform: uppercase;
-}}
-.pl-col-icon {{
+}
+.pl-col-icon {
   font-size: 22px;
   color: #334155;
   display: block;
   margin-bottom: 4px;
-}}
-.pl-col-title {{
+}
+.pl-col-title {
   font-size: 13px;
   font-weight: 600;
   color: #1e293b;
-}}
-.pl-col-count {{
+}
+.pl-col-count {
   font-size: 11px;
   color: #94a3b8;
-}}
+}
 
-.pl-matrix tbody td {{
+.pl-matrix tbody td {
   padding: 12px;
   border-bottom: 1px solid #f1f5f9;
   vertical-align: top;
-}}
-.pl-matrix tbody td:first-child {{
+}
+.pl-matrix tbody td:first-child {
   padding: 14px 16px;
-}}
-.pl-matrix tbody tr:nth-child(even) td {{
+}
+.pl-matrix tbody tr:nth-child(even) td {
   background: #fff;
-}}
-.pl-matrix tbody tr:nth-child(odd) td {{
+}
+.pl-matrix tbody tr:nth-child(odd) td {
   background: #fafbfc;
-}}
-.pl-row-title {{
+}
+.pl-row-title {
   font-size: 13px;
   font-weight: 600;
   color: #1e293b;
   display: block;
   line-height: 1.3;
-}}
-.pl-row-count {{
+}
+.pl-row-count {
   font-size: 11px;
   color: #94a3b8;
-}}
-.pl-cell {{
+}
+.pl-cell {
   display: flex;
   flex-wrap: wrap;
   gap: 5px;
   align-content: flex-start;
   min-height: 36px;
   min-width: 150px;
-}}
-.pl-empty {{
+}
+.pl-empty {
   color: #cbd5e1;
   font-size: 12px;
-}}
+}
 
 /* ── Product badges ──────────────────────────────────── */
-.pl-badge {{
+.pl-badge {
   display: inline-flex;
   align-items: center;
   padding: 4px 10px;
@@ -366,51 +492,51 @@ def generate_css() -> str:
   white-space: nowrap;
   cursor: default;
   transition: transform 0.1s, box-shadow 0.1s;
-}}
-.pl-badge:hover {{
+}
+.pl-badge:hover {
   transform: translateY(-1px);
   box-shadow: 0 2px 6px rgba(0,0,0,0.08);
-}}
-.pl-dot {{
+}
+.pl-dot {
   width: 7px;
   height: 7px;
   border-radius: 50%;
   margin-right: 6px;
   flex-shrink: 0;
-}}
+}
 
 /* ── Distribution section ────────────────────────────── */
-.pl-dist {{
+.pl-dist {
   background: #f8fafc;
   border: 1px solid #e2e8f0;
   border-radius: 8px;
   padding: 32px 28px;
   margin-top: 12px;
-}}
-.pl-dist-grid {{
+}
+.pl-dist-grid {
   display: grid;
   grid-template-columns: 1fr;
   gap: 36px;
   margin-top: 20px;
-}}
-@media (min-width: 768px) {{
-  .pl-dist-grid {{
+}
+@media (min-width: 768px) {
+  .pl-dist-grid {
     grid-template-columns: repeat(3, 1fr);
-  }}
-}}
-.pl-dist-col h3 {{
+  }
+}
+.pl-dist-col h3 {
   font-size: 14px;
   font-weight: 600;
   color: #334155;
   margin-bottom: 14px;
-}}
-.pl-dist-row {{
+}
+.pl-dist-row {
   display: flex;
   align-items: center;
   gap: 8px;
   margin-bottom: 7px;
-}}
-.pl-dist-label {{
+}
+.pl-dist-label {
   font-size: 11px;
   color: #64748b;
   width: 120px;
@@ -419,335 +545,494 @@ def generate_css() -> str:
   overflow: hidden;
   text-overflow: ellipsis;
   white-space: nowrap;
-}}
-.pl-dist-label-sm {{
+}
+.pl-dist-label-sm {
   width: 90px;
-}}
-.pl-dist-track {{
+}
+.pl-dist-track {
   flex: 1;
   height: 14px;
   background: #f1f5f9;
   border-radius: 2px;
   overflow: hidden;
-}}
-.pl-dist-fill {{
+}
+.pl-dist-fill {
   height: 100%;
   border-radius: 2px;
   transition: width 0.3s ease;
-}}
-.pl-dist-count {{
+}
+.pl-dist-count {
   font-size: 11px;
   font-weight: 500;
   color: #475569;
   width: 22px;
   text-align: right;
   flex-shrink: 0;
-}}
+}
 
 /* ── Footer ──────────────────────────────────────────── */
-.pl-footer {{
+.pl-footer {
   padding: 20px 0;
   border-top: 1px solid #e2e8f0;
   margin-top: 16px;
-}}
-.pl-footer p {{
+}
+.pl-footer p {
   font-size: 12px;
   color: #94a3b8;
-}}
+}
 
 /* ── Function group badge colors ─────────────────────── */
-{chr(10).join(fg_rules)}
-"""
+""")
+
+    # Function group badge colors
+    for fg, c in FUNCTION_COLORS.items():
+        cls = slug(fg)
+        w(
+            f".pl-badge.fg-{cls} {{\n"
+            f"  background: {c['bg']};\n"
+            f"  color: {c['text']};\n"
+            f"  border: 1px solid {c['border']};\n"
+            f"}}\n"
+            f".pl-badge.fg-{cls} .pl-dot {{\n"
+            f"  background: {c['dot']};\n"
+            f"}}\n"
+            f".pl-legend-dot.fg-{cls} {{\n"
+            f"  background: {c['dot']};\n"
+            f"}}\n"
+        )
+
+    return buf.getvalue()
 
 
 # ─────────────────────────────────────────────────────────────
 # HTML body generation (for the Bob Swift HTML macro)
 # ─────────────────────────────────────────────────────────────
 
-def generate_html_body(products: list[dict]) -> str:
+def dist_bar(label: str, count: int, max_count: int, color: str, small_label: bool = False) -> str:
+    """Render one row of a distribution bar chart for a canonical label."""
+    pct = (count / max_count * 100) if max_count > 0 else 0
+    label_cls = "pl-dist-label pl-dist-label-sm" if small_label else "pl-dist-label"
+    return (
+        f'<div class="pl-dist-row">'
+        f'<span class="{label_cls}">{_ESC[label]}</span>'
+        f'<div class="pl-dist-track">'
+        f'<div class="pl-dist-fill" style="width:{pct:.1f}%;background:{color}"></div>'
+        f'</div>'
+        f'<span class="pl-dist-count">{count}</span>'
+        f'</div>'
+    )
+
+
+def generate_html_body(
+    products: ProductIndex | Iterable[Product],
+    out: TextIO | None = None,
+    minimal_tooltips: bool = False,
+) -> str | None:
     """Generate the HTML body for the Bob Swift HTML macro.
 
     This uses CSS class names that match the stylesheet from generate_css().
     Paste this into the Bob Swift HTML macro body.
+
+    `products` is either a prebuilt ProductIndex or any iterable of products,
+    which is indexed in a single pass. If `out` is given the body is written
+    to it and None is returned; otherwise the body is returned as a string.
+    With `minimal_tooltips`, badge tooltips show only the product name rather
+    than repeating its function group, product type and family line.
     """
-    total = len(products)
-    family_lines_in_data = list(OrderedDict.fromkeys(
-        fl for fl in FAMILY_LINES if any(p["family_line"] == fl for p in products)
-    ))
-    function_groups_in_data = list(OrderedDict.fromkeys(
-        fg for fg in FUNCTION_GROUPS if any(p["function_group"] == fg for p in products)
-    ))
-
-    fg_counts = Counter(p["function_group"] for p in products)
-    type_counts = Counter(p["product_type"] for p in products)
-    fl_counts = Counter(p["family_line"] for p in products)
+    index = products if isinstance(products, ProductIndex) else index_products(products)
+    cells = index.cells
+    fg_counts, type_counts, fl_counts = index.fg_counts, index.type_counts, index.fl_counts
+    total = index.total
+
+    # The canonical lists already define order and uniqueness
+    family_lines_in_data = [fl for fl in FAMILY_LINES if fl in fl_counts]
+    function_groups_in_data = [fg for fg in FUNCTION_GROUPS if fg in fg_counts]
 
     n_families = len(family_lines_in_data)
-    n_types = len(set(p["product_type"] for p in products))
+    n_types = len(type_counts)
     n_groups = len(function_groups_in_data)
 
-    def esc(s):
-        return html.escape(s)
-
-    def badge(product):
-        cls = slug(product["function_group"])
-        return (
-            f'<span class="pl-badge fg-{cls}" title="{esc(product["name"])}'
-            f'&#10;{esc(product["function_group"])} &middot; {esc(product["product_type"])}'
-            f'&#10;{esc(product["family_line"])}">'
-            f'<span class="pl-dot"></span>'
-            f'{esc(product["name"])}'
-            f'</span>'
-        )
+    esc = html.escape
 
-    def dist_bar(label, count, max_count, color, small_label=False):
-        pct = (count / max_count * 100) if max_count > 0 else 0
-        label_cls = "pl-dist-label pl-dist-label-sm" if small_label else "pl-dist-label"
-        return (
-            f'<div class="pl-dist-row">'
-            f'<span class="{label_cls}">{esc(label)}</span>'
-            f'<div class="pl-dist-track">'
-            f'<div class="pl-dist-fill" style="width:{pct:.1f}%;background:{color}"></div>'
-            f'</div>'
-            f'<span class="pl-dist-count">{count}</span>'
-            f'</div>'
-        )
+    def badge(name, fg, cell_tooltip):
+        badge_open, badge_mid = _fg_badge_parts(fg)
+        name_e = esc(name)
+        if minimal_tooltips:
+            return "".join((badge_open, name_e, _BADGE_DOT, name_e, _BADGE_CLOSE))
+        return "".join((badge_open, name_e, badge_mid, cell_tooltip, name_e, _BADGE_CLOSE))
 
-    parts = []
+    def by_count(labels, counts):
+        # Largest first; the stable sort keeps canonical order for ties
+        return sorted(((k, counts.get(k, 0)) for k in labels), key=itemgetter(1), reverse=True)
+
+    buf = io.StringIO() if out is None else None
+    w = buf.write if out is None else out.write
 
     # ── Wrapper ────────────────────────────────────────────
-    parts.append('<div class="pl">')
+    w('<div class="pl">\n')
 
     # ── Accent bar ─────────────────────────────────────────
-    parts.append('<div class="pl-accent"></div>')
+    w('<div class="pl-accent"></div>\n')
 
     # ── Header ─────────────────────────────────────────────
-    parts.append('<div class="pl-header">')
-    parts.append('  <p class="pl-eyebrow">Organization Overview</p>')
-    parts.append('  <h1>Product Landscape</h1>')
-    parts.append(
+    w('<div class="pl-header">\n')
+    w('  <p class="pl-eyebrow">Organization Overview</p>\n')
+    w('  <h1>Product Landscape</h1>\n')
+    w(
         f'  <p class="pl-subtitle">How our {total} products align across function groups, '
-        f'product types, and family lines &mdash; a single view of the full portfolio.</p>'
+        f'product types, and family lines &mdash; a single view of the full portfolio.</p>\n'
     )
-    parts.append('  <div class="pl-stats">')
+    w('  <div class="pl-stats">\n')
     for val, label in [(total, "Products"), (n_families, "Family Lines"),
                        (n_types, "Product Types"), (n_groups, "Function Groups")]:
-        parts.append(
+        w(
             f'    <div class="pl-stat">'
             f'<span class="pl-stat-val">{val}</span>'
-            f'<span class="pl-stat-lbl">{label}</span></div>'
+            f'<span class="pl-stat-lbl">{label}</span></div>\n'
         )
-    parts.append('  </div>')
-    parts.append('</div>')
+    w('  </div>\n')
+    w('</div>\n')
 
     # ── Function Group Legend ──────────────────────────────
-    parts.append('<div class="pl-legend">')
-    parts.append('  <p class="pl-eyebrow">Function Groups</p>')
-    parts.append('  <div class="pl-legend-items">')
+    w('<div class="pl-legend">\n')
+    w('  <p class="pl-eyebrow">Function Groups</p>\n')
+    w('  <div class="pl-legend-items">\n')
     for fg in function_groups_in_data:
-        cls = slug(fg)
-        parts.append(
-            f'    <span class="pl-legend-chip">'
-            f'<span class="pl-legend-dot fg-{cls}"></span>'
-            f'{esc(fg)}</span>'
-        )
-    parts.append('  </div>')
-    parts.append('</div>')
+        w(_LEGEND_CHIP[fg])
+    w('  </div>\n')
+    w('</div>\n')
 
     # ── Shape Key ─────────────────────────────────────────
-    parts.append('<div class="pl-shapes">')
-    parts.append('  <span class="pl-eyebrow">Product Types</span>')
-    for pt in PRODUCT_TYPES:
-        icon_entity = TYPE_SHAPES[pt][0]
-        parts.append(
-            f'  <span class="pl-shape-item">'
-            f'<span class="pl-shape-icon">{icon_entity}</span> {esc(pt)}</span>'
-        )
-    parts.append('</div>')
+    w(_SHAPE_KEY)
 
     # ── Matrix Table ──────────────────────────────────────
-    parts.append('<div class="pl-matrix-wrap">')
-    parts.append('<table class="pl-matrix">')
+    w('<div class="pl-matrix-wrap">\n')
+    w('<table class="pl-matrix">\n')
 
     # Header
-    parts.append('<thead><tr>')
-    parts.append('  <th>Family Line</th>')
+    w('<thead><tr>\n')
+    w('  <th>Family Line</th>\n')
     for pt in PRODUCT_TYPES:
-        icon_entity = TYPE_SHAPES[pt][0]
-        pt_count = type_counts.get(pt, 0)
-        parts.append(
-            f'  <th>'
-            f'<span class="pl-col-icon">{icon_entity}</span>'
-            f'<span class="pl-col-title">{esc(pt)}</span><br/>'
-            f'<span class="pl-col-count">{pt_count} products</span></th>'
-        )
-    parts.append('</tr></thead>')
+        w(_TH_OPEN[pt])
+        w(str(type_counts.get(pt, 0)))
+        w(_TH_CLOSE)
+    w('</tr></thead>\n')
 
     # Body rows
-    parts.append('<tbody>')
+    w('<tbody>\n')
     for fl in family_lines_in_data:
-        fl_total = fl_counts.get(fl, 0)
-        parts.append('<tr>')
-        parts.append(
-            f'  <td><span class="pl-row-title">{esc(fl)}</span>'
-            f'<span class="pl-row-count">{fl_total} products</span></td>'
-        )
+        w(_ROW_OPEN[fl])
+        w(str(fl_counts.get(fl, 0)))
+        w(_ROW_OPEN_CLOSE)
         for pt in PRODUCT_TYPES:
-            cell_products = get_products(products, fl, pt)
-            if cell_products:
-                inner = "".join(badge(p) for p in cell_products)
-            else:
-                inner = '<span class="pl-empty">&mdash;</span>'
-            parts.append(f'  <td><div class="pl-cell">{inner}</div></td>')
-        parts.append('</tr>')
-    parts.append('</tbody>')
-    parts.append('</table>')
-    parts.append('</div>')
+            cell = cells.get((fl, pt))
+            if cell is None:
+                w(_EMPTY_CELL)
+                continue
+            # Tooltip tail shared by every badge in the cell
+            cell_tooltip = f'{_ESC[pt]}&#10;{_ESC[fl]}{_BADGE_DOT}'
+            w(_CELL_OPEN)
+            for name, fg in zip(*cell):
+                w(badge(name, fg, cell_tooltip))
+            w(_CELL_CLOSE)
+        w('</tr>\n')
+    w('</tbody>\n')
+    w('</table>\n')
+    w('</div>\n')
 
     # ── Distribution Summary ──────────────────────────────
-    max_fg = max(fg_counts.values()) if fg_counts else 1
-    max_type = max(type_counts.values()) if type_counts else 1
-    max_fl = max(fl_counts.values()) if fl_counts else 1
-
-    parts.append('<div class="pl-dist">')
-    parts.append('  <p class="pl-eyebrow">Distribution Summary</p>')
-    parts.append('  <div class="pl-dist-grid">')
-
-    # By Function Group
-    parts.append('    <div class="pl-dist-col">')
-    parts.append('      <h3>By Function Group</h3>')
-    for fg in sorted(function_groups_in_data, key=lambda x: -fg_counts.get(x, 0)):
-        parts.append(f'      {dist_bar(fg, fg_counts[fg], max_fg, FUNCTION_COLORS[fg]["dot"])}')
-    parts.append('    </div>')
-
-    # By Product Type
-    parts.append('    <div class="pl-dist-col">')
-    parts.append('      <h3>By Product Type</h3>')
-    for pt in sorted(PRODUCT_TYPES, key=lambda x: -type_counts.get(x, 0)):
-        parts.append(f'      {dist_bar(pt, type_counts[pt], max_type, "#475569", small_label=True)}')
-    parts.append('    </div>')
-
-    # By Family Line
-    parts.append('    <div class="pl-dist-col">')
-    parts.append('      <h3>By Family Line</h3>')
-    for fl in sorted(family_lines_in_data, key=lambda x: -fl_counts.get(x, 0)):
-        parts.append(f'      {dist_bar(fl, fl_counts[fl], max_fl, "#818CF8")}')
-    parts.append('    </div>')
-
-    parts.append('  </div>')
-    parts.append('</div>')
+    w('<div class="pl-dist">\n')
+    w('  <p class="pl-eyebrow">Distribution Summary</p>\n')
+    w('  <div class="pl-dist-grid">\n')
+
+    # (title, labels in canonical order, counts, bar color, small label)
+    sections = (
+        ("By Function Group", function_groups_in_data, fg_counts, _FG_DOT.__getitem__, False),
+        ("By Product Type", PRODUCT_TYPES, type_counts, lambda pt: "#475569", True),
+        ("By Family Line", family_lines_in_data, fl_counts, lambda fl: "#818CF8", False),
+    )
+    for title, labels, counts, color, small_label in sections:
+        max_count = max(counts.values()) if counts else 1
+        w('    <div class="pl-dist-col">\n')
+        w(f'      <h3>{title}</h3>\n')
+        for label, n in by_count(labels, counts):
+            w(f'      {dist_bar(label, n, max_count, color(label), small_label)}\n')
+        w('    </div>\n')
+
+    w('  </div>\n')
+    w('</div>\n')
 
     # ── Footer ────────────────────────────────────────────
-    parts.append('<div class="pl-footer">')
-    parts.append(
+    w('<div class="pl-footer">\n')
+    w(
         f'  <p>Product Landscape &middot; {total} Products &middot; '
-        f'3 Classification Dimensions</p>'
+        f'3 Classification Dimensions</p>\n'
     )
-    parts.append('</div>')
+    w('</div>\n')
 
-    parts.append('</div>')  # close .pl wrapper
+    w('</div>')  # close .pl wrapper
 
-    return "\n".join(parts)
+    return buf.getvalue() if buf is not None else None
 
 
 # ─────────────────────────────────────────────────────────────
 # Standalone HTML (browser preview)
 # ─────────────────────────────────────────────────────────────
 
-def generate_standalone_html(products: list[dict]) -> str:
-    """Full HTML document combining CSS + body for local preview."""
-    css = generate_css()
-    body = generate_html_body(products)
-    return f"""<!DOCTYPE html>
+_STANDALONE_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="UTF-8">
 <meta name="viewport" content="width=device-width, initial-scale=1.0">
 <title>Product Landscape</title>
 <style>
-body {{ margin: 0; padding: 24px; background: #fff; }}
-{css}
+body { margin: 0; padding: 24px; background: #fff; }
+"""
+_STANDALONE_MID = """
 </style>
 </head>
 <body>
-{body}
+"""
+_STANDALONE_TAIL = """
 </body>
 </html>"""
 
 
+def write_standalone_html(out: TextIO, body: str | ProductIndex, css: str,
+                          minimal_tooltips: bool = False) -> None:
+    """Write the full preview document to `out` without concatenating it first.
+
+    `body` is either a prebuilt HTML body or a ProductIndex, whose body is
+    then generated straight into `out` (`minimal_tooltips` applies only then).
+    """
+    out.write(_STANDALONE_HEAD)
+    out.write(css)
+    out.write(_STANDALONE_MID)
+    if isinstance(body, ProductIndex):
+        generate_html_body(body, out=out, minimal_tooltips=minimal_tooltips)
+    else:
+        out.write(body)
+    out.write(_STANDALONE_TAIL)
+
+
+def generate_standalone_html(body: str, css: str) -> str:
+    """Full HTML document combining CSS + body for local preview."""
+    buf = io.StringIO()
+    write_standalone_html(buf, body, css)
+    return buf.getvalue()
+
+
 # ─────────────────────────────────────────────────────────────
 # Confluence storage format (wraps in Bob Swift HTML + CSS macros)
 # ─────────────────────────────────────────────────────────────
 
-def generate_confluence_storage(products: list[dict]) -> str:
-    """Generate Confluence storage format using Bob Swift HTML macro + CSS macro.
+def write_confluence_storage(out: TextIO, body: str, css: str) -> None:
+    """Write the Confluence storage format to `out` without concatenating it first.
 
     This produces a page body with two Confluence macros:
       1. A CSS macro containing the stylesheet
       2. A Bob Swift HTML macro containing the HTML body
     """
-    css = generate_css()
-    body = generate_html_body(products)
-
     # CSS macro (bob swift)
-    css_macro = (
+    out.write(
         '<ac:structured-macro ac:name="css">\n'
         '<ac:plain-text-body><![CDATA[\n'
-        f'{css}\n'
-        ']]></ac:plain-text-body>\n'
+    )
+    out.write(css)
+    out.write(
+        '\n]]></ac:plain-text-body>\n'
         '</ac:structured-macro>'
+        '\n\n'
     )
 
     # HTML macro (bob swift)
-    html_macro = (
+    out.write(
         '<ac:structured-macro ac:name="html-bobswift">\n'
         '<ac:plain-text-body><![CDATA[\n'
-        f'{body}\n'
-        ']]></ac:plain-text-body>\n'
+    )
+    out.write(body)
+    out.write(
+        '\n]]></ac:plain-text-body>\n'
         '</ac:structured-macro>'
     )
 
-    return f"{css_macro}\n\n{html_macro}"
+
+def generate_confluence_storage(body: str, css: str) -> str:
+    """Generate Confluence storage format using Bob Swift HTML macro + CSS macro."""
+    buf = io.StringIO()
+    write_confluence_storage(buf, body, css)
+    return buf.getvalue()
 
 
 # ─────────────────────────────────────────────────────────────
 # Confluence REST API integration
 # ─────────────────────────────────────────────────────────────
 
-def confluence_api(method: str, path: str, body: dict | None = None) -> dict:
-    """Make a Confluence REST API call."""
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5  # seconds, doubled after each failed attempt
+MAX_RETRY_AFTER = 60  # seconds; longer server-requested waits are capped
+REQUEST_TIMEOUT = 30  # seconds
+
+# Failures that retrying cannot fix: bad certificates, unknown hosts, nothing listening
+_NON_TRANSIENT_ERRORS = (ssl.SSLCertVerificationError, socket.gaierror, ConnectionRefusedError)
+
+# Keep-alive connections reused across API calls, keyed by (scheme, host). Each
+# entry also carries the headers a plain-HTTP proxy needs (None when direct or
+# tunnelled).
+_connections: dict[tuple[str, str], tuple[HTTPConnection, dict | None]] = {}
+
+# With --gzip, request bodies at least this large are sent gzip-encoded
+GZIP_MIN_BYTES = 4096
+GZIP_LEVEL = 6
+
+# Set once the server rejects a gzip-encoded request body that it then
+# accepts uncompressed
+_gzip_unsupported = False
+
+
+def _proxy_for(scheme: str, netloc: str):
+    """Proxy from the *_proxy environment variables (as urlopen used), or None."""
+    proxy = getproxies().get(scheme)
+    if not proxy or proxy_bypass(netloc):
+        return None
+    return urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+
+def _connection(scheme: str, netloc: str) -> tuple[HTTPConnection, dict | None]:
+    """Return the open connection to `netloc`, creating it on first use.
+
+    HTTPS goes through a CONNECT tunnel when a proxy is configured. Plain HTTP
+    is sent to the proxy itself, so the second element holds the headers each
+    request needs and signals that request targets must be absolute URLs.
+    """
+    entry = _connections.get((scheme, netloc))
+    if entry is not None:
+        return entry
+
+    proxy = _proxy_for(scheme, netloc)
+    proxy_headers = {}
+    if proxy is not None and proxy.username:
+        creds = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+        proxy_headers["Proxy-Authorization"] = f"Basic {base64.b64encode(creds.encode()).decode()}"
+
+    if proxy is None:
+        conn_cls = HTTPSConnection if scheme == "https" else HTTPConnection
+        entry = (conn_cls(netloc, timeout=REQUEST_TIMEOUT), None)
+    elif scheme == "https":
+        conn = HTTPSConnection(proxy.hostname, proxy.port or 80, timeout=REQUEST_TIMEOUT)
+        conn.set_tunnel(netloc, headers=proxy_headers)
+        entry = (conn, None)
+    else:
+        entry = (HTTPConnection(proxy.hostname, proxy.port or 80, timeout=REQUEST_TIMEOUT),
+                 proxy_headers)
+    _connections[(scheme, netloc)] = entry
+    return entry
+
+
+@cache
+def _api_config() -> tuple[str, dict[str, str]]:
+    """Base URL and request headers, read from the environment on first use."""
     base_url = os.environ["CONFLUENCE_URL"].rstrip("/")
     user = os.environ["CONFLUENCE_USER"]
     token = os.environ["CONFLUENCE_TOKEN"]
-
-    url = f"{base_url}/rest/api{path}"
     credentials = base64.b64encode(f"{user}:{token}".encode()).decode()
-
     headers = {
         "Authorization": f"Basic {credentials}",
         "Content-Type": "application/json",
         "Accept": "application/json",
     }
+    return base_url, headers
+
+
+def _send(method: str, url, data: bytes | None, headers: dict,
+          retry_statuses: tuple[int, ...] = RETRY_STATUSES):
+    """Send one request over the shared connection, retrying transient failures.
+
+    Responses with a status in `retry_statuses` are retried too. Returns the
+    final response and its body.
+    """
+    target = f"{url.path}?{url.query}" if url.query else url.path
+    for attempt in range(MAX_RETRIES + 1):
+        delay = RETRY_BACKOFF * 2 ** attempt
+        # Outside the try: a bad host or port is not a broken connection
+        conn, proxy_headers = _connection(url.scheme, url.netloc)
+        try:
+            if proxy_headers is None:
+                conn.request(method, target, body=data, headers=headers)
+            else:
+                conn.request(method, url.geturl(), body=data, headers={**headers, **proxy_headers})
+            resp = conn.getresponse()
+            payload = resp.read()
+        except (OSError, HTTPException) as e:
+            # Drop the broken connection so the next attempt reconnects
+            _connections.pop((url.scheme, url.netloc))[0].close()
+            if attempt == MAX_RETRIES or isinstance(e, _NON_TRANSIENT_ERRORS):
+                raise
+            time.sleep(delay)
+            continue
+        if resp.status in retry_statuses and attempt < MAX_RETRIES:
+            retry_after = resp.getheader("Retry-After", "")
+            time.sleep(min(int(retry_after), MAX_RETRY_AFTER) if retry_after.isdigit() else delay)
+            continue
+        return resp, payload
+
+
+def confluence_api(method: str, path: str, body: dict | None = None, compress: bool = False) -> dict:
+    """Make a Confluence REST API call.
+
+    Calls share one keep-alive connection per host (through the proxy from
+    the *_proxy environment variables, if any), and are retried with
+    exponential backoff on transient connection errors and on 429/5xx
+    responses. Redirects are not followed; a 3xx is reported as an error.
+    With `compress`, a JSON body of at least GZIP_MIN_BYTES is first sent
+    gzip-encoded, without status retries. Servers that cannot decode it
+    answer 400, 415 or 500 alike, so any error response is followed by an
+    uncompressed resend; if that succeeds, later calls skip gzip.
+    """
+    global _gzip_unsupported
 
+    base_url, headers = _api_config()
+    url = urlsplit(f"{base_url}/rest/api{path}")
     data = json.dumps(body).encode("utf-8") if body else None
-    req = Request(url, data=data, headers=headers, method=method)
 
-    try:
-        with urlopen(req) as resp:
-            return json.loads(resp.read().decode("utf-8"))
-    except HTTPError as e:
-        error_body = e.read().decode("utf-8") if e.fp else ""
-        print(f"Confluence API error {e.code}: {error_body}", file=sys.stderr)
-        raise
+    resp = None
+    gzip_failed = False
+    if compress and data and len(data) >= GZIP_MIN_BYTES and not _gzip_unsupported:
+        gzip_headers = {**headers, "Content-Encoding": "gzip"}
+        resp, payload = _send(method, url, gzip.compress(data, GZIP_LEVEL), gzip_headers,
+                              retry_statuses=())
+        if resp.status >= 400:
+            gzip_failed = True
+            resp = None
+    if resp is None:
+        resp, payload = _send(method, url, data, headers)
+        if gzip_failed and resp.status < 400:
+            _gzip_unsupported = True
+
+    if 300 <= resp.status < 400:
+        location = resp.getheader("Location", "(no Location header)")
+        print(f"Confluence API error {resp.status}: redirected to {location}; "
+              f"set CONFLUENCE_URL to the site's final base URL", file=sys.stderr)
+        raise HTTPError(url.geturl(), resp.status, resp.reason, resp.headers, None)
+    if resp.status >= 400:
+        error_body = payload.decode("utf-8", errors="replace")
+        print(f"Confluence API error {resp.status}: {error_body}", file=sys.stderr)
+        raise HTTPError(url.geturl(), resp.status, resp.reason, resp.headers, None)
+    return json.loads(payload.decode("utf-8"))
 
 
 def get_page(page_id: str) -> dict:
     """Get current page info (needed for version number)."""
-    return confluence_api("GET", f"/content/{page_id}?expand=version,body.storage")
+    return confluence_api("GET", f"/content/{page_id}?expand=version")
+
 
+def update_page(page_id: str, title: str, storage_body: str, current_version: int,
+                compress: bool = False) -> dict:
+    """Update a Confluence page with storage format content.
 
-def update_page(page_id: str, title: str, storage_body: str, current_version: int) -> dict:
-    """Update a Confluence page with storage format content."""
+    With `compress`, a large request body is sent gzip-encoded.
+    """
     body = {
         "version": {"number": current_version + 1},
         "title": title,
@@ -759,25 +1044,99 @@ def update_page(page_id: str, title: str, storage_body: str, current_version: in
             }
         },
     }
-    return confluence_api("PUT", f"/content/{page_id}", body)
+    return confluence_api("PUT", f"/content/{page_id}", body, compress=compress)
 
 
-def publish_to_confluence(products: list[dict]):
-    """Publish the generated visualization to a Confluence page."""
-    page_id = os.environ["CONFLUENCE_PAGE_ID"]
+def page_cache_path(base_url: str, page_id: str) -> Path:
+    """Local file remembering the last published title and version of a page.
 
-    print(f"Fetching current page {page_id}...")
-    page = get_page(page_id)
-    title = page["title"]
-    current_version = page["version"]["number"]
+    Keyed by site and page id, since page ids are only unique per instance.
+    """
+    key = hashlib.sha256(f"{base_url.rstrip('/')}|{page_id}".encode()).hexdigest()[:16]
+    return Path.home() / ".cache" / f"confluence_page_{key}.json"
 
-    storage_content = generate_confluence_storage(products)
 
-    print(f"Updating '{title}' (v{current_version} → v{current_version + 1})...")
-    result = update_page(page_id, title, storage_content, current_version)
-    new_version = result["version"]["number"]
+def read_page_cache(base_url: str, page_id: str) -> dict:
+    """Return the cached page info, or an empty dict if there is none."""
+    try:
+        return json.loads(page_cache_path(base_url, page_id).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_page_cache(base_url: str, page_id: str, info: dict):
+    """Persist page info for the next publish; failures are not fatal."""
+    path = page_cache_path(base_url, page_id)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(info), encoding="utf-8")
+    except OSError as e:
+        print(f"Warning: could not write {path}: {e}", file=sys.stderr)
+
+
+def publish_fingerprint(csv_path: Path, minimal_tooltips: bool = False) -> str:
+    """SHA-256 of everything that determines the published page.
 
+    Covers the CSV contents, the options that change the markup, and the
+    generator itself (its CSS and this script's source), so an upgraded
+    generator republishes even when the CSV is unchanged.
+    """
+    h = hashlib.sha256(b"minimal-tooltips\n" if minimal_tooltips else b"full-tooltips\n")
+    h.update(generate_css().encode("utf-8"))
+    h.update(Path(__file__).read_bytes())
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def publish_to_confluence(body: str, css: str, title: str | None = None,
+                          current_version: int | None = None, fingerprint: str | None = None,
+                          compress: bool = False):
+    """Publish the generated visualization to a Confluence page.
+
+    When the page title and current version are known (passed in or cached
+    from the last publish), the page is updated without fetching it first.
+    If that version turns out to be stale (HTTP 409), the page is fetched
+    and the update retried. An explicit `title` always wins; only a cached
+    title is replaced by the one fetched from Confluence. With `compress`,
+    the page body is uploaded gzip-encoded.
+    """
     base_url = os.environ["CONFLUENCE_URL"].rstrip("/")
+    page_id = os.environ["CONFLUENCE_PAGE_ID"]
+    cached = read_page_cache(base_url, page_id)
+    requested_title = title
+    title = title or cached.get("title")
+    if current_version is None:
+        current_version = cached.get("version")
+
+    storage_content = generate_confluence_storage(body, css)
+
+    result = None
+    if title and current_version is not None:
+        print(f"Updating '{title}' (v{current_version} → v{current_version + 1})...")
+        try:
+            result = update_page(page_id, title, storage_content, current_version,
+                                 compress=compress)
+        except HTTPError as e:
+            if e.code != 409:
+                raise
+            print("Known version is stale; fetching the current page...")
+
+    if result is None:
+        print(f"Fetching current page {page_id}...")
+        page = get_page(page_id)
+        title = requested_title or page["title"]
+        current_version = page["version"]["number"]
+
+        print(f"Updating '{title}' (v{current_version} → v{current_version + 1})...")
+        result = update_page(page_id, title, storage_content, current_version,
+                             compress=compress)
+
+    new_version = result["version"]["number"]
+    write_page_cache(base_url, page_id, {"title": title, "version": new_version,
+                                         "fingerprint": fingerprint})
+
     page_url = f"{base_url}/pages/viewpage.action?pageId={page_id}"
     print(f"Done! Page updated to v{new_version}")
     print(f"View: {page_url}")
@@ -798,6 +1157,20 @@ def main():
                         help="Write CSS stylesheet (paste into CSS macro)")
     parser.add_argument("--publish", action="store_true",
                         help="Publish to Confluence via REST API (requires env vars)")
+    parser.add_argument("--minimal-tooltips", action="store_true",
+                        help="Show only the product name in badge tooltips (smaller output)")
+    parser.add_argument("--title",
+                        help="Page title to publish under (skips fetching the page when "
+                             "the version is also known)")
+    parser.add_argument("--page-version", type=int, metavar="N",
+                        help="Current page version (defaults to the version cached from "
+                             "the last publish)")
+    parser.add_argument("--gzip", action="store_true",
+                        help="Upload the page body gzip-encoded when publishing (falls back "
+                             "to uncompressed if the server rejects it)")
+    parser.add_argument("--force", action="store_true",
+                        help="Publish even if the CSV and generator are unchanged since the "
+                             "last publish")
     args = parser.parse_args()
 
     # Load data
@@ -806,37 +1179,70 @@ def main():
         print(f"Error: CSV file not found: {csv_path}", file=sys.stderr)
         sys.exit(1)
 
-    products = load_products(str(csv_path))
-    print(f"Loaded {len(products)} products from {csv_path}")
+    # Publishing unchanged input again is a no-op, so check before doing any work
+    publish = args.publish
+    fingerprint = None
+    if publish:
+        required_vars = ["CONFLUENCE_URL", "CONFLUENCE_PAGE_ID", "CONFLUENCE_USER", "CONFLUENCE_TOKEN"]
+        missing = [v for v in required_vars if not os.environ.get(v)]
+        if missing:
+            print(f"Error: Missing environment variables: {', '.join(missing)}", file=sys.stderr)
+            for v in required_vars:
+                print(f"  export {v}=...", file=sys.stderr)
+            sys.exit(1)
+        fingerprint = publish_fingerprint(csv_path, args.minimal_tooltips)
+        cached = read_page_cache(os.environ["CONFLUENCE_URL"], os.environ["CONFLUENCE_PAGE_ID"])
+        # An explicit --title change or --page-version is a request to publish
+        unchanged = (cached.get("fingerprint") == fingerprint
+                     and args.title in (None, cached.get("title"))
+                     and args.page_version is None)
+        if unchanged and not args.force:
+            print("No changes since the last publish; skipping (use --force to republish)")
+            publish = False
+            if not (args.output or args.confluence_html or args.confluence_css):
+                return
+
+    # Parse, bucket and count in one pass over the CSV
+    try:
+        index = index_products(iter_products(str(csv_path)))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Loaded {index.total} products from {csv_path}")
+
+    # Build the body and stylesheet once and share them across every output.
+    # Publishing needs it as a string; when a single file is its only
+    # consumer it is streamed straight to disk instead.
+    body = None
+    if publish or (args.output and args.confluence_html):
+        body = generate_html_body(index, minimal_tooltips=args.minimal_tooltips)
+    css = generate_css()
 
     # Standalone HTML preview
     if args.output:
-        standalone = generate_standalone_html(products)
-        Path(args.output).write_text(standalone, encoding="utf-8")
-        print(f"Standalone HTML → {args.output} ({len(standalone):,} bytes)")
+        with open(args.output, "w", encoding="utf-8", buffering=1 << 20) as f:
+            write_standalone_html(f, index if body is None else body, css,
+                                  minimal_tooltips=args.minimal_tooltips)
+        print(f"Standalone HTML → {args.output} ({os.path.getsize(args.output):,} bytes)")
 
     # Confluence HTML body (for Bob Swift HTML macro)
     if args.confluence_html:
-        body = generate_html_body(products)
-        Path(args.confluence_html).write_text(body, encoding="utf-8")
-        print(f"HTML body → {args.confluence_html} ({len(body):,} bytes)")
+        with open(args.confluence_html, "w", encoding="utf-8", buffering=1 << 20) as f:
+            if body is None:
+                generate_html_body(index, out=f, minimal_tooltips=args.minimal_tooltips)
+            else:
+                f.write(body)
+        print(f"HTML body → {args.confluence_html} ({os.path.getsize(args.confluence_html):,} bytes)")
 
     # Confluence CSS (for CSS macro)
     if args.confluence_css:
-        css = generate_css()
         Path(args.confluence_css).write_text(css, encoding="utf-8")
         print(f"CSS stylesheet → {args.confluence_css} ({len(css):,} bytes)")
 
     # Publish to Confluence
-    if args.publish:
-        required_vars = ["CONFLUENCE_URL", "CONFLUENCE_PAGE_ID", "CONFLUENCE_USER", "CONFLUENCE_TOKEN"]
-        missing = [v for v in required_vars if not os.environ.get(v)]
-        if missing:
-            print(f"Error: Missing environment variables: {', '.join(missing)}", file=sys.stderr)
-            for v in required_vars:
-                print(f"  export {v}=...", file=sys.stderr)
-            sys.exit(1)
-        publish_to_confluence(products)
+    if publish:
+        publish_to_confluence(body, css, title=args.title, current_version=args.page_version,
+                              fingerprint=fingerprint, compress=args.gzip)
 
     if not any([args.output, args.confluence_html, args.confluence_css, args.publish]):
         print("\nUsage options:")